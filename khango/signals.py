@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+from django.dispatch import Signal
+
+guard_tripped = Signal()
+"""Sent when a khango view refuses or aborts a request because one of its
+resource guards tripped, with the `view` instance and the `guard` name.
+"""
@@ -1,2 +1,3 @@
 # -*- coding: utf-8 -*-
 from .base import *  # noqa
+from .routers import *  # noqa
@@ -1,20 +1,252 @@
 # -*- coding: utf-8 -*-
+import asyncio
+import json
+import logging
+from copy import copy
+
+import django
+from asgiref.sync import async_to_sync
+from django.core.exceptions import PermissionDenied, SuspiciousOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import (
+    Http404, HttpResponse, HttpResponseBadRequest, QueryDict,
+    StreamingHttpResponse,
+)
+from django.urls import NoReverseMatch, get_script_prefix, resolve, reverse
+from django.utils.http import urlencode
+from django.views.generic import View
 from django.views.generic.list import BaseListView
 
-from .behaviors import KhangoMixin
+from .behaviors import (
+    AsyncKhangoMixin, BadRequest, ContentTypeMixin, KhangoMixin, UrlMixin,
+    aiter_sync,
+)
+from .executors import call_in_thread, get_executor
 
 __all__ = [
-    'ListView',
+    'ListView', 'AsyncListView', 'BatchView',
 ]
 
+logger = logging.getLogger('django.request')
+
 
 class ListView(KhangoMixin, BaseListView):
     base_name = 'list'
 
-    @classmethod
-    def get_url_pattern(cls):
-        return '^taskslist/$'
 
-    @classmethod
-    def get_url_name(cls):
-        return 'taskslist_list'
+class AsyncListView(AsyncKhangoMixin, BaseListView):
+    base_name = 'list'
+
+
+class BatchView(UrlMixin, ContentTypeMixin, View):
+    """Run several khango views in a single request.
+
+    The request body is a JSON list of sub-requests such as
+    `{"view": "question_list", "params": {"page": 2}}`, where "view" is the
+    `get_url_name()` of one of `views` and "params" the query parameters.
+    An optional "accept" member overrides the sub-request "Accept" header,
+    which defaults to "application/json".
+    Sub-requests run the view wired to the URL name in the URLconf, along
+    with its decorators such as `login_required`; views missing from the
+    URLconf run bare, without any decorator.
+    The response holds, for each sub-request and in the same order, its
+    view name, HTTP status and body.
+    """
+
+    base_name = 'batch'
+    http_method_names = ['post']
+    content_types = ['application/json', 'application/x-ndjson']
+
+    views = []
+    """Khango views that can be requested in a batch."""
+
+    max_requests = 20
+    """Maximum number of sub-requests in a batch."""
+
+    max_workers = None
+    """Number of threads running the sub-requests concurrently, each one
+    with its own database connections.
+    Threads come from the "batch" pool shared by all the requests of the
+    process, so that the `KHANGO_BATCH_THREADS` setting (4 by default)
+    bounds the connections they open.
+    If None, sub-requests are run one after another.
+    """
+
+    def post(self, request, *args, **kwargs):
+        try:
+            sub_requests = json.loads(request.body.decode(request.encoding or
+                                                          'utf-8'))
+        except ValueError:
+            return HttpResponseBadRequest("Invalid JSON body.",
+                                          content_type='text/plain')
+        if not isinstance(sub_requests, list) or not all(
+                self.is_valid_sub_request(x) for x in sub_requests):
+            return HttpResponseBadRequest(
+                "Expected a list of {\"view\": ..., \"params\": ...}.",
+                content_type='text/plain',
+            )
+        if len(sub_requests) > self.max_requests:
+            return HttpResponseBadRequest(
+                "At most {} sub-requests are allowed.".format(
+                    self.max_requests),
+                content_type='text/plain',
+            )
+        return self.render_to_response(self.run_all(sub_requests))
+
+    def is_valid_sub_request(self, sub_request):
+        """Check the types of the members of a sub-request."""
+        if not isinstance(sub_request, dict):
+            return False
+        if not isinstance(sub_request.get('view'), str):
+            return False
+        if not isinstance(sub_request.get('accept', ''), str):
+            return False
+        params = sub_request.get('params', {})
+        if not isinstance(params, dict):
+            return False
+        scalars = (str, int, float)
+        return all(
+            isinstance(value, scalars) or isinstance(value, list) and all(
+                isinstance(x, scalars) for x in value)
+            for value in params.values()
+        )
+
+    def run_all(self, sub_requests):
+        """Yield the encoded result of each sub-request, in order."""
+        if not self.max_workers or len(sub_requests) < 2:
+            for sub_request in sub_requests:
+                yield self.encode_result(self.run(sub_request))
+            return
+        workers = min(self.max_workers, len(sub_requests))
+        executor = get_executor('batch')
+        futures = [
+            executor.submit(call_in_thread, self.run_many,
+                            sub_requests[i::workers])
+            for i in range(workers)
+        ]
+        for i in range(len(sub_requests)):
+            result = futures[i % workers].result()[i // workers]
+            yield self.encode_result(result)
+
+    def run_many(self, sub_requests):
+        return [self.run(sub_request) for sub_request in sub_requests]
+
+    def run(self, sub_request):
+        """Run a single sub-request and return its result."""
+        view_name = sub_request['view']
+        result = {'view': view_name}
+        view_class = self.get_view_classes().get(view_name)
+        if view_class is None:
+            result.update(status=404, body=json.dumps(
+                "Unknown view \"{}\".".format(view_name)))
+            return result
+        request = self.get_sub_request(view_class,
+                                       sub_request.get('params') or {},
+                                       sub_request.get('accept'))
+        try:
+            view, args, kwargs = self.get_view(view_class)
+            if asyncio.iscoroutinefunction(view):
+                view = async_to_sync(view)
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+        except Http404:
+            response = HttpResponse(status=404)
+        except PermissionDenied:
+            response = HttpResponse(status=403)
+        except (BadRequest, SuspiciousOperation):
+            response = HttpResponse(status=400)
+        except Exception:
+            logger.exception("Batch sub-request failed: %s", view_name,
+                             extra={'status_code': 500, 'request': request})
+            response = HttpResponse(status=500)
+        result['status'] = response.status_code
+        try:
+            result['body'] = self.get_response_body(response)
+        finally:
+            self.close_response(response)
+        return result
+
+    def get_view_classes(self):
+        return {view.get_url_name(): view for view in self.views}
+
+    def get_view(self, view_class):
+        """Return the view function wired to `view_class` in the URLconf, with
+        its decorators, and the arguments of its path, or a bare
+        `as_view()` if it is not wired.
+        """
+        try:
+            path = reverse(view_class.get_url_name())
+        except NoReverseMatch:
+            return view_class.as_view(), (), {}
+        match = resolve('/' + path[len(get_script_prefix()):])
+        return match.func, match.args, match.kwargs
+
+    def get_sub_request(self, view_class, params, accept=None):
+        """Return a GET request for `view_class` sharing the user, session and
+        headers of the batch request.
+        """
+        request = copy(self.request)
+        query_string = urlencode(params, doseq=True)
+        request.method = 'GET'
+        request.GET = QueryDict(query_string)
+        request.META = dict(self.request.META, REQUEST_METHOD='GET',
+                            QUERY_STRING=query_string,
+                            HTTP_ACCEPT=accept or 'application/json')
+        try:
+            request.path = request.path_info = reverse(
+                view_class.get_url_name())
+        except NoReverseMatch:
+            pass
+        return request
+
+    def get_response_body(self, response):
+        """Return the body of a sub-response as a JSON document."""
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+        else:
+            content = response.content
+        content = content.decode(response.charset)
+        if response.get('Content-Type', '').startswith('application/json'):
+            return content or 'null'
+        return json.dumps(content or None)
+
+    def close_response(self, response):
+        """Release the resources of a sub-response, such as its concurrency
+        slot, without the `request_finished` signal of `response.close()`,
+        which would close the connections of the batch request.
+        """
+        for closer in response._resource_closers:
+            closer()
+        response._resource_closers.clear()
+
+    def encode_result(self, result):
+        """Encode a result as JSON, embedding the already encoded body."""
+        body = result.pop('body')
+        head = json.dumps(result, cls=DjangoJSONEncoder)
+        return '{}, "body": {}}}'.format(head[:-1], body)
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.content_type == 'application/x-ndjson':
+            response_kwargs['content_type'] = self.content_type
+            return self.render_ndjson(context, **response_kwargs)
+        return super().render_to_response(context, **response_kwargs)
+
+    def render_json(self, context, **response_kwargs):
+        content = '{{"responses": [{}]}}'.format(', '.join(context))
+        return HttpResponse(content, **response_kwargs)
+
+    def render_ndjson(self, context, **response_kwargs):
+        """Return a newline delimited JSON response.
+        Under ASGI, sub-requests run out of the event loop: as the response
+        streams when Django supports asynchronous streaming responses, and
+        beforehand otherwise.
+        """
+        lines = (x + '\n' for x in context)
+        if isinstance(self.request, ASGIRequest):
+            if django.VERSION >= (4, 2):
+                lines = aiter_sync(lines)
+            else:
+                lines = list(lines)
+        return StreamingHttpResponse(lines, **response_kwargs)
@@ -1,20 +1,168 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import logging
 import re
+from collections import defaultdict
+from contextlib import nullcontext
+from itertools import islice
 
+import django
+from asgiref.sync import sync_to_async
 from django.conf.urls import url
-from django.core.exceptions import FieldDoesNotExist
-from django.http import HttpResponse, JsonResponse
+from django.core.exceptions import (
+    FieldDoesNotExist, ObjectDoesNotExist, ValidationError,
+)
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections
+from django.db.models import (
+    Count, F, Manager, Model, QuerySet, Window, prefetch_related_objects,
+)
+from django.db.models.functions import RowNumber
+from django.http import (
+    Http404, HttpResponse, JsonResponse, StreamingHttpResponse,
+)
+from django.template.loader import select_template
 from django.template.response import TemplateResponse
 from django.utils.text import camel_case_to_spaces
+from django.utils.translation import gettext as _
+
+from ..signals import guard_tripped as guard_tripped_signal
+from .executors import call_in_thread, get_executor
+from .guards import GuardTripped, get_request_slots, statement_timeout
+
+try:
+    from django.core.exceptions import BadRequest
+except ImportError:  # Django < 3.2
+    from django.core.exceptions import SuspiciousOperation as BadRequest
+
+try:
+    from asgiref.sync import markcoroutinefunction
+except ImportError:  # asgiref < 3.6
+    def markcoroutinefunction(func):
+        func._is_coroutine = asyncio.coroutines._is_coroutine
+        return func
 
 __all__ = [
     'BaseMixin', 'ModelMixin', 'ContentTypeMixin', 'UrlMixin', 'KhangoMixin',
+    'AsyncKhangoMixin',
 ]
 
 logger = logging.getLogger('django.request')
 
 
+def get_field_value(obj, field_name):
+    """Follow `field_name` from `obj` and return a JSON serializable value.
+    Related objects are represented by their primary key, missing reverse
+    one-to-one objects by None and to-many relations by a list.
+    """
+    head, sep, tail = field_name.partition('__')
+    value = get_related(obj, head)
+    if isinstance(value, Manager):
+        if tail:
+            return [get_field_value(o, tail) for o in value.all()]
+        return [o.pk for o in value.all()]
+    if callable(value):
+        value = value()
+    if not tail:
+        return value.pk if isinstance(value, Model) else value
+    if value is None:
+        return None
+    return get_field_value(value, tail)
+
+
+def get_related(obj, name):
+    """Return the `name` attribute of `obj`, or None for a missing reverse
+    one-to-one object.
+    """
+    try:
+        return getattr(obj, name)
+    except ObjectDoesNotExist:
+        return None
+
+
+def prefetch_limited(objects, name, limit, ordering=()):
+    """Prefetch, in a single query, the first `limit` objects of the `name`
+    reverse foreign key of each of `objects`, ranked by `ordering` with a
+    window function.
+    Return the prefetched objects, and record the total number of related
+    objects of truncated relations in the `khango_truncated` dict of each
+    parent object.
+    """
+    rel = type(objects[0])._meta.get_field(name)
+    if not rel.one_to_many:
+        raise ValueError((
+            "Only reverse foreign keys can be limited, {} is not."
+        ).format(name))
+    if not isinstance(ordering, (list, tuple)):
+        raise ValueError((
+            "The ordering of {} must be a list of field names, not {!r}."
+        ).format(name, ordering))
+    field = rel.field
+    order_by = [
+        F(x[1:]).desc() if x.startswith('-') else F(x).asc()
+        for x in ordering
+    ] + [F('pk').asc()]
+    queryset = rel.related_model._default_manager.filter(**{
+        '{}__in'.format(field.name): [
+            getattr(obj, field.target_field.attname) for obj in objects
+        ],
+    }).order_by().annotate(
+        khango_rank=Window(RowNumber(), partition_by=[F(field.attname)],
+                           order_by=order_by),
+        khango_total=Window(Count('pk'), partition_by=[F(field.attname)]),
+    )
+    sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+    raw_queryset = rel.related_model._default_manager.raw(
+        'SELECT * FROM ({}) khango_ranked WHERE khango_rank <= %s '
+        'ORDER BY khango_rank'.format(sql),
+        tuple(params) + (limit,),
+        using=queryset.db,
+    )
+    related = defaultdict(list)
+    for related_obj in raw_queryset:
+        related[getattr(related_obj, field.attname)].append(related_obj)
+    cache_name = field.remote_field.get_cache_name()
+    for obj in objects:
+        related_objs = related[getattr(obj, field.target_field.attname)]
+        for related_obj in related_objs:
+            field.set_cached_value(related_obj, obj)
+        if related_objs and related_objs[0].khango_total > limit:
+            obj.__dict__.setdefault('khango_truncated', {})[name] = \
+                related_objs[0].khango_total
+        related_queryset = getattr(obj, name).get_queryset()
+        related_queryset._result_cache = related_objs
+        related_queryset._prefetch_done = True
+        obj.__dict__.setdefault('_prefetched_objects_cache', {})[
+            cache_name] = related_queryset
+    return [x for related_objs in related.values() for x in related_objs]
+
+
+def is_indexed(field):
+    """Tell whether `field` is the first column of a database index."""
+    if not getattr(field, 'concrete', False):
+        return False
+    if field.primary_key or field.unique or field.db_index:
+        return True
+    opts = field.model._meta
+    if any(index.fields and index.fields[0].lstrip('-') == field.name
+           for index in opts.indexes):
+        return True
+    together = list(getattr(opts, 'index_together', ()))
+    together += list(opts.unique_together)
+    return any(fields[0] == field.name for fields in together)
+
+
+async def aiter_sync(iterable):
+    """Iterate a synchronous iterable out of the event loop."""
+    iterator = iter(iterable)
+    done = object()
+    while True:
+        item = await sync_to_async(next)(iterator, done)
+        if item is done:
+            return
+        yield item
+
+
 class BaseMixin:
 
     base_name = None
@@ -48,6 +196,58 @@ class ModelMixin(BaseMixin):
         - a model method
     """
 
+    prefetch_workers = None
+    """Number of threads running the independent branches of the prefetch
+    plan concurrently, each one with its own database connections.
+    Threads come from the "prefetch" pool shared by all the requests of the
+    process, so that the `KHANGO_PREFETCH_THREADS` setting (4 by default)
+    bounds the connections they open.
+    If None, Django runs prefetch queries one after another, which is also
+    the case within a transaction, as other connections would not see its
+    uncommitted changes.
+    """
+
+    prefetch_limits = None
+    """Mapping of reverse foreign keys of `model` to `(limit, ordering)`,
+    for instance `{'answers': (3, ['-add_date'])}`, to only prefetch the
+    first objects of each relation.
+    Objects whose relation was truncated get a `khango_truncated` dict
+    mapping the relation name to its total number of objects, listed under
+    `truncated` in JSON responses by primary key.
+    """
+
+    filter_fields = None
+    """List of fields the client can filter on with query parameters, such
+    as `?author__username=bob` or `?add_date__gte=2016-01-01`.
+    Parameters naming any other field are refused.
+    Fields reached through a to-many relation are not supported, as they
+    would repeat rows.
+    """
+
+    ordering_fields = None
+    """List of fields the client can order by with the `ordering_param`
+    query parameter, such as `?order=-add_date,title`.
+    """
+
+    ordering_param = 'order'
+
+    ordering_requires_index = False
+    """Refuse to order by fields that are not the first column of an index,
+    so that clients cannot trigger full table sorts.
+    """
+
+    stream_html = False
+    """Stream HTML responses, rendering objects as they are fetched.
+    The template is rendered once with `stream_part` set to "head", once per
+    chunk of objects with `stream_part` set to "rows", and once with
+    `stream_part` set to "foot", and must only output the matching part.
+    Under ASGI, chunks are fetched out of the event loop, which requires
+    Django 4.2: older versions render the whole response at once instead.
+    """
+
+    stream_chunk_size = 100
+    """Number of objects fetched and rendered at once when streaming."""
+
     __fields = None
     __only = None
     __select_related = None
@@ -61,35 +261,410 @@ class ModelMixin(BaseMixin):
         """Select only requested fields and do accurate joins."""
         queryset = self.get_base_queryset()
 
-        only = self.get_only()
+        only = [x for x in self.get_only() if not self._is_prefetched(x)]
         if only:
             queryset = queryset.only(*only)
 
-        select_related = self.get_select_related()
+        select_related = [x for x in self.get_select_related()
+                          if not self._is_prefetched(x)]
         if select_related:
             queryset = queryset.select_related(*select_related)
 
-        prefetch_related = self.get_prefetch_related()
-        if prefetch_related:
-            queryset = queryset.prefetch_related(*prefetch_related)
+        if self.filter_fields:
+            for path in self.filter_fields:
+                if self._is_to_many(path):
+                    raise ValueError((
+                        "{} filters on {}, which goes through a to-many "
+                        "relation."
+                    ).format(type(self), path))
+            filters = self.get_filters()
+            if filters:
+                try:
+                    queryset = queryset.filter(**filters)
+                except (ValueError, ValidationError) as e:
+                    raise BadRequest("Invalid filter value: {}".format(e))
+
+        ordering = self.get_requested_ordering()
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+
+        limits = self.prefetch_limits or {}
+        for name in limits:
+            if name not in self.get_prefetch_related():
+                raise ValueError((
+                    "{} limits {}, which is not a prefetched relation."
+                ).format(type(self), name))
+
+        if not self.prefetch_workers:
+            prefetch_related = [x for x in self.get_prefetch_lookups()
+                                if x.split('__', 1)[0] not in limits]
+            if prefetch_related:
+                queryset = queryset.prefetch_related(*prefetch_related)
 
         return queryset
 
+    def get_filters(self):
+        """Return the filters requested by the query parameters, checked
+        against `filter_fields`.
+        Raise `BadRequest` if a parameter names a field that is not allowed
+        or an unknown lookup.
+        """
+        filters = {}
+        reserved = {self.ordering_param, getattr(self, 'page_kwarg', 'page')}
+        for key, value in self.request.GET.items():
+            if key in reserved:
+                continue
+            try:
+                path, field, lookup_name = self._parse_lookup(key, self.model)
+            except FieldDoesNotExist:
+                continue  # Not a filter, such as the page number.
+            if path not in self.filter_fields:
+                raise BadRequest("Filtering on {} is not allowed.".format(
+                    path))
+            if lookup_name and ('__' in lookup_name or
+                                field.get_lookup(lookup_name) is None):
+                raise BadRequest("Unsupported lookup: {}".format(key))
+            if lookup_name == 'in':
+                value = value.split(',')
+            elif lookup_name == 'range':
+                value = value.split(',')
+                if len(value) != 2:
+                    raise BadRequest("Range needs two values: {}".format(key))
+            elif lookup_name == 'isnull':
+                value = value.lower() in ('1', 'true')
+            filters[key] = value
+        return filters
+
+    def get_requested_ordering(self):
+        """Return the ordering requested by the `ordering_param` query
+        parameter, checked against `ordering_fields`.
+        """
+        ordering = self.request.GET.get(self.ordering_param) \
+            if self.ordering_fields else None
+        if not ordering:
+            return None
+        ordering = ordering.split(',')
+        for field_name in ordering:
+            path = field_name[1:] if field_name.startswith('-') else field_name
+            if path not in self.ordering_fields:
+                raise BadRequest("Ordering by {} is not allowed.".format(
+                    path))
+            if self.ordering_requires_index:
+                try:
+                    path, field, lookup_name = self._parse_lookup(
+                        path, self.model)
+                except FieldDoesNotExist:
+                    lookup_name = path
+                if lookup_name:
+                    raise ValueError((
+                        "{} orders by {}, which is not a field."
+                    ).format(type(self), path))
+                if not is_indexed(field):
+                    raise BadRequest((
+                        "Ordering by {} is not allowed, it is not indexed."
+                    ).format(path))
+        return ordering
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['fields'] = [self.get_field(f) for f in self.fields]
+        self.limit_object_list(context)
+        # When streaming, objects are prefetched by chunks in `iter_chunks()`,
+        # and values formats do not build objects at all.
+        if (self.prefetch_workers or self.prefetch_limits) and \
+                not self.is_streaming() and not self.is_values_format():
+            self.prefetch_objects(context['object_list'])
         return context
 
+    def limit_object_list(self, context):
+        """Bound `context['object_list']` before its objects are prefetched.
+        """
+
+    def is_values_format(self):
+        """Tell whether the response is built out of `values_list()` rows
+        only, so that objects must not be fetched beforehand.
+        """
+        if getattr(self, 'content_type', None) != 'application/json':
+            return False
+        if self.content_type_params.get('format') not in ('columns', 'table'):
+            return False
+        return not set(self.fields) - set(self.get_values_fields())
+
+    def is_streaming(self):
+        if not self.stream_html or \
+                getattr(self, 'content_type', None) != 'text/html':
+            return False
+        # Django < 4.2 iterates streaming content within the event loop.
+        return django.VERSION >= (4, 2) or not self.is_asgi()
+
+    def is_asgi(self):
+        return isinstance(getattr(self, 'request', None), ASGIRequest)
+
+    def render_html(self, context, **response_kwargs):
+        if not self.is_streaming():
+            return super().render_html(context, **response_kwargs)
+        template = select_template(self.get_template_names(),
+                                   using=self.template_engine)
+        parts = self.iter_html(template, context)
+        if self.is_asgi():
+            # Django would buffer a synchronous iterator.
+            parts = aiter_sync(parts)
+        return StreamingHttpResponse(parts, **response_kwargs)
+
+    def iter_html(self, template, context):
+        """Render `template` part by part, see `stream_html`."""
+        context = dict(context)
+        object_list = context.pop('object_list')
+        yield template.render(dict(context, object_list=[],
+                                   stream_part='head'), self.request)
+        for chunk in self.iter_chunks(object_list):
+            yield template.render(dict(context, object_list=chunk,
+                                       stream_part='rows'), self.request)
+        yield template.render(dict(context, object_list=[],
+                                   stream_part='foot'), self.request)
+
+    def iter_chunks(self, object_list):
+        """Yield lists of `stream_chunk_size` objects of `object_list` with
+        their relations prefetched, fetching them as they are needed.
+        """
+        lookups = ()
+        if isinstance(object_list, QuerySet) and \
+                object_list._result_cache is None:
+            lookups = object_list._prefetch_related_lookups
+            object_list = object_list.prefetch_related(None).iterator(
+                chunk_size=self.stream_chunk_size)
+        iterator = iter(object_list)
+        while True:
+            chunk = list(islice(iterator, self.stream_chunk_size))
+            if not chunk:
+                return
+            if lookups:
+                prefetch_related_objects(chunk, *lookups)
+            if self.prefetch_workers or self.prefetch_limits:
+                self.prefetch_objects(chunk)
+            yield chunk
+
+    def prefetch_objects(self, object_list):
+        """Run the prefetch queries left out of `get_queryset()` and attach
+        their results to the objects of `object_list`.
+        With `prefetch_workers` and out of a transaction, the branches of the
+        plan are split among as many tasks of the "prefetch" pool.
+        """
+        limits = self.prefetch_limits or {}
+        branches = defaultdict(list)
+        for lookup in self.get_prefetch_lookups():
+            name = lookup.split('__', 1)[0]
+            if self.prefetch_workers or name in limits:
+                branches[name].append(lookup)
+        objects = list(object_list)
+        if not branches or not objects:
+            return
+        in_transaction = connections[
+            self.model._default_manager.db].in_atomic_block
+        if not self.prefetch_workers or len(branches) == 1 or in_transaction:
+            for name, lookups in branches.items():
+                self.prefetch_branch(objects, name, lookups)
+            return
+        for obj in objects:
+            if not hasattr(obj, '_prefetched_objects_cache'):
+                obj._prefetched_objects_cache = {}
+        branches = list(branches.items())
+        workers = min(self.prefetch_workers, len(branches))
+        executor = get_executor('prefetch')
+        futures = [
+            executor.submit(call_in_thread, self.prefetch_thread_branches,
+                            objects, branches[i::workers])
+            for i in range(workers)
+        ]
+        for future in futures:
+            future.result()
+
+    def prefetch_thread_branches(self, objects, branches):
+        """Prefetch `(name, lookups)` branches from a pooled thread, on its
+        own connections.
+        """
+        for name, lookups in branches:
+            self.prefetch_branch(objects, name, lookups)
+
+    def prefetch_branch(self, objects, name, lookups):
+        """Prefetch `lookups`, which all go through the `name` relation."""
+        limits = self.prefetch_limits or {}
+        if name not in limits:
+            prefetch_related_objects(objects, *lookups)
+            return
+        related_objects = prefetch_limited(objects, name, *limits[name])
+        sub_lookups = [x.split('__', 1)[1] for x in lookups if x != name]
+        if sub_lookups and related_objects:
+            prefetch_related_objects(related_objects, *sub_lookups)
+
     def get_context_object_name(self, object_list):
         return None
 
+    def get_json_data(self, context):
+        """Serialize the requested fields of each object.
+        With the `format=normalized` media type parameter, objects reached
+        through `select_related` are emitted once in a side table keyed by
+        model label and primary key, and rows only hold their primary key.
+        """
+        object_list = context['object_list']
+        data_format = self.content_type_params.get('format')
+        if data_format == 'normalized':
+            data = self.serialize_normalized(object_list)
+        elif data_format in ('columns', 'table'):
+            data = self.serialize_columnar(object_list, data_format)
+        else:
+            data = {
+                'object_list': [
+                    {name: get_field_value(obj, name) for name in self.fields}
+                    for obj in object_list
+                ],
+            }
+        if self.prefetch_limits:
+            data['truncated'] = {
+                str(obj.pk): obj.khango_truncated
+                for obj in object_list
+                if getattr(obj, 'khango_truncated', None)
+            }
+        page = context.get('page_obj')
+        if page is not None:
+            data['page'] = {
+                'number': page.number,
+                'num_pages': page.paginator.num_pages,
+                'count': page.paginator.count,
+            }
+        return data
+
+    def serialize_normalized(self, object_list):
+        related = defaultdict(dict)
+        done = defaultdict(set)
+        rows = [
+            self._serialize_normalized(obj, self.fields, '', related, done)
+            for obj in object_list
+        ]
+        return {
+            'object_list': rows,
+            'related': related,
+            'relations': self.get_relations(),
+        }
+
+    def _serialize_normalized(self, obj, field_names, base_name, related,
+                              done):
+        select_related = self.get_select_related()
+        row = {}
+        nested = defaultdict(list)
+        for field_name in field_names:
+            head, sep, tail = field_name.partition('__')
+            path = '{}__{}'.format(base_name, head) if base_name else head
+            if path in select_related:
+                nested[head].append(tail)
+            else:
+                row[field_name] = get_field_value(obj, field_name)
+        for head, tails in nested.items():
+            target = get_related(obj, head)
+            if target is None:
+                row[head] = None
+                continue
+            row[head] = target.pk
+            key = (target._meta.label_lower, str(target.pk))
+            todo = [t for t in tails if t and t not in done[key]]
+            if todo:
+                done[key].update(todo)
+                path = '{}__{}'.format(base_name, head) if base_name else head
+                entry = related[key[0]].setdefault(key[1], {})
+                entry.update(self._serialize_normalized(target, todo, path,
+                                                        related, done))
+        return row
+
+    def serialize_columnar(self, object_list, data_format):
+        """Emit a header describing the fields, then either one array per
+        field (`columns`) or one positional array per object (`table`).
+        """
+        fields = self.get_fields()
+        header = [
+            {
+                'name': name,
+                'type': (fields[name].get_internal_type()
+                         if hasattr(fields[name], 'get_internal_type')
+                         else None),
+            }
+            for name in self.fields
+        ]
+        rows = self.get_values_rows(object_list)
+        if data_format == 'columns':
+            columns = [[] for name in self.fields]
+            for row in rows:
+                for column, value in zip(columns, row):
+                    column.append(value)
+            return {'fields': header, 'columns': columns}
+        return {'fields': header, 'rows': rows}
+
+    def get_values_rows(self, object_list):
+        """Return a list of positional rows, fetched as plain values when
+        every field can be, so that no model instance is built.
+        """
+        values_queryset = self.get_values_queryset(object_list)
+        if values_queryset is not None:
+            return [list(row) for row in values_queryset]
+        return [
+            [get_field_value(obj, name) for name in self.fields]
+            for obj in object_list
+        ]
+
+    def get_values_queryset(self, object_list):
+        """Return `object_list` as a `values_list()` queryset, or None if
+        it is already evaluated or some field is not a plain value.
+        """
+        if not isinstance(object_list, QuerySet):
+            return None
+        if object_list._result_cache is not None:
+            return None
+        if set(self.fields) - set(self.get_values_fields()):
+            return None
+        return object_list.prefetch_related(None).values_list(*self.fields)
+
+    @classmethod
+    def get_values_fields(cls):
+        """Return the fields that `values_list()` can fetch as is, that is
+        concrete fields only reached through forward single relations.
+        """
+        values_fields = []
+        for field_name in cls.fields:
+            model = cls.model
+            for part in field_name.split('__'):
+                if model is None:
+                    break
+                try:
+                    field = model._meta.get_field(part)
+                except FieldDoesNotExist:
+                    break
+                if not field.concrete or field.many_to_many:
+                    break
+                model = field.related_model
+            else:
+                values_fields.append(field_name)
+        return values_fields
+
+    @classmethod
+    def get_relations(cls):
+        """Map each `select_related` path to the label of its model, leaving
+        out the paths below prefetched relations, which are not normalized.
+        """
+        relations = {}
+        for path in cls.get_select_related():
+            if cls._is_prefetched(path):
+                continue
+            model = cls.model
+            for part in path.split('__'):
+                model = model._meta.get_field(part).related_model
+            relations[path] = model._meta.label_lower
+        return relations
+
     def get_template_names(self):
         opts = self.model._meta
         app_label, model_name = opts.app_label, opts.model_name
         view_name = self.get_view_name()
 
         names = [
-            self.template_name,
             '{}/{}/{}/{}.html'.format(app_label, model_name, view_name,
                                       self.base_name),
             '{}/{}/{}.html'.format(app_label, model_name, view_name),
@@ -97,6 +672,8 @@ class ModelMixin(BaseMixin):
             '{}/{}.html'.format(app_label, self.base_name),
             'khango/{}.html'.format(self.base_name),
         ]
+        if self.template_name:
+            names.insert(0, self.template_name)
         return names
 
     @classmethod
@@ -148,6 +725,33 @@ class ModelMixin(BaseMixin):
             return cls._parse_field(field_name_parts[1], field.related_model,
                                     base_name)
 
+    @classmethod
+    def _parse_lookup(cls, lookup, model, base_name='', base_field=None):
+        """Split `lookup` into a field path and a lookup name, following
+        relations the way `_parse_field()` does.
+        Return the path, the field it ends on and the lookup name.
+        """
+        lookup_parts = lookup.split('__', 1)
+        try:
+            if lookup_parts[0] == 'pk':
+                field = model._meta.pk
+            else:
+                field = model._meta.get_field(lookup_parts[0])
+        except FieldDoesNotExist:
+            if not base_name:
+                raise
+            return base_name, base_field, lookup
+        if base_name:
+            base_name = '{}__{}'.format(base_name, lookup_parts[0])
+        else:
+            base_name = lookup_parts[0]
+        if len(lookup_parts) == 1:
+            return base_name, field, ''
+        if field.related_model is None:
+            return base_name, field, lookup_parts[1]
+        return cls._parse_lookup(lookup_parts[1], field.related_model,
+                                 base_name, field)
+
     @classmethod
     def get_fields(cls):
         cls._parse_fields()
@@ -173,6 +777,35 @@ class ModelMixin(BaseMixin):
         cls._parse_fields()
         return cls.__prefetch_related
 
+    @classmethod
+    def get_prefetch_lookups(cls):
+        """Return the sorted lookups to prefetch, including the joins that
+        go through a prefetched relation.
+        """
+        lookups = set(cls.get_prefetch_related())
+        lookups.update(x for x in cls.get_select_related()
+                       if cls._is_prefetched(x))
+        return sorted(lookups)
+
+    @classmethod
+    def _is_to_many(cls, path):
+        """Tell whether `path` is or goes through a to-many relation."""
+        model = cls.model
+        for part in path.split('__'):
+            field = model._meta.get_field(part)
+            if field.many_to_many or field.one_to_many:
+                return True
+            model = field.related_model
+            if model is None:
+                return False
+        return False
+
+    @classmethod
+    def _is_prefetched(cls, path):
+        """Tell whether `path` is or goes through a prefetched relation."""
+        return any(path == x or path.startswith(x + '__')
+                   for x in cls.get_prefetch_related())
+
 
 class ContentTypeMixin:
     """Return a suitable response according to the "Accept" request header."""
@@ -191,6 +824,7 @@ class ContentTypeMixin:
         self.content_type = self.get_content_type()
         if self.content_type is None:
             return self.http_not_acceptable(request, *args, **kwargs)
+        self.content_type_params = self.get_content_type_params()
         return super().dispatch(request, *args, **kwargs)
 
     def render_to_response(self, context, **response_kwargs):
@@ -222,9 +856,13 @@ class ContentTypeMixin:
 
     def render_json(self, context, **response_kwargs):
         """Return context as JSON response."""
+        return JsonResponse(self.get_json_data(context), **response_kwargs)
+
+    def get_json_data(self, context):
+        """Return the data to serialize as JSON."""
         data = context.flatten()
         del data['False'], data['True'], data['None']
-        return JsonResponse(data, **response_kwargs)
+        return data
 
     def render_xml(self, context, **response_kwargs):
         """Return an XML response."""
@@ -238,8 +876,8 @@ class ContentTypeMixin:
                            'request': request,
                        })
         header = 'Accept'
-        values = ','.join(self.get_available_content_types())
-        return HttpResponse('{}: {}'.format(header, values), status_code=406,
+        values = ','.join(self.content_types)
+        return HttpResponse('{}: {}'.format(header, values), status=406,
                             content_type='text/plain')
 
     def get_content_type(self):
@@ -257,6 +895,19 @@ class ContentTypeMixin:
             return content_types[0]
         return None
 
+    def get_content_type_params(self):
+        """Return the media type parameters sent by the client along with
+        the selected content type, quality excluded.
+        """
+        http_accept = self.request.META.get('HTTP_ACCEPT', '*/*')
+        for raw_content_type in http_accept.split(','):
+            parts = [x.strip() for x in raw_content_type.split(';')]
+            if parts[0] == self.content_type:
+                params = dict(x.split('=', 1) for x in parts[1:] if '=' in x)
+                params.pop('q', None)
+                return params
+        return {}
+
     def get_accepted_content_types(self):
         """Return the list of content types accepted by the client for the
         current request.
@@ -298,4 +949,208 @@ class UrlMixin(BaseMixin):
 
 
 class KhangoMixin(UrlMixin, ModelMixin, ContentTypeMixin):
-    pass
+    """Put `ModelMixin`, `ContentTypeMixin` and `UrlMixin` together, and
+    guard the resources a single request can use.
+    """
+
+    statement_timeout = None
+    """Maximum duration in seconds of each database query fetching the
+    objects. Slower queries are interrupted and the request fails with
+    HTTP 503 "Service Unavailable".
+    """
+
+    max_rows = None
+    """Maximum number of objects a request can list. Requests listing more
+    fail with HTTP 413 "Payload Too Large".
+    """
+
+    max_concurrent_requests = None
+    """Maximum number of requests of this view served at once by the
+    process. Others fail with HTTP 503 "Service Unavailable".
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        slots = None
+        if self.max_concurrent_requests:
+            slots = get_request_slots(type(self), self.max_concurrent_requests)
+            if not slots.acquire(blocking=False):
+                return self.http_guard_tripped(
+                    GuardTripped('max_concurrent_requests', 503))
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        except GuardTripped as e:
+            response = self.http_guard_tripped(e)
+        except BaseException:
+            if slots is not None:
+                slots.release()
+            raise
+        if asyncio.iscoroutine(response):
+            return self._aguard(response, slots)
+        return self._release_with(response, slots)
+
+    async def _aguard(self, coroutine, slots):
+        try:
+            response = await coroutine
+        except GuardTripped as e:
+            response = self.http_guard_tripped(e)
+        except BaseException:
+            if slots is not None:
+                slots.release()
+            raise
+        return self._release_with(response, slots)
+
+    def _release_with(self, response, slots):
+        """Release `slots` once `response` is sent."""
+        if slots is None:
+            return response
+        if response.streaming and hasattr(response, '_resource_closers'):
+            response._resource_closers.append(slots.release)
+        else:
+            slots.release()
+        return response
+
+    def get_context_data(self, **kwargs):
+        """Fetch the objects within the guards."""
+        with self.guard_statements():
+            context = super().get_context_data(**kwargs)
+            if self.max_rows is None and self.statement_timeout is not None \
+                    and not self.is_streaming() \
+                    and not self.is_values_format():
+                len(context['object_list'])
+        return context
+
+    def limit_object_list(self, context):
+        """Check `max_rows` before any object is fetched or prefetched."""
+        if self.max_rows is None:
+            return
+        object_list = context['object_list']
+        if self.is_streaming():
+            if isinstance(object_list, QuerySet) and object_list[
+                    self.max_rows:self.max_rows + 1].exists():
+                raise GuardTripped('max_rows', 413)
+            return
+        if isinstance(object_list, QuerySet) and \
+                object_list._result_cache is None:
+            object_list = object_list[:self.max_rows + 1]
+        # Values rows are fetched and checked by `get_values_rows()`.
+        if not self.is_values_format() and len(object_list) > self.max_rows:
+            raise GuardTripped('max_rows', 413)
+        context['object_list'] = object_list
+        if context.get('page_obj') is not None:
+            context['page_obj'].object_list = object_list
+
+    def get_values_rows(self, object_list):
+        with self.guard_statements():
+            rows = super().get_values_rows(object_list)
+        if self.max_rows is not None and len(rows) > self.max_rows:
+            raise GuardTripped('max_rows', 413)
+        return rows
+
+    def iter_chunks(self, object_list):
+        chunks = super().iter_chunks(object_list)
+        while True:
+            try:
+                with self.guard_statements():
+                    chunk = next(chunks, None)
+            except GuardTripped as e:
+                self.http_guard_tripped(e)  # Headers are already sent.
+                raise
+            if chunk is None:
+                return
+            yield chunk
+
+    def prefetch_thread_branches(self, objects, branches):
+        """Guard the connections of the pooled thread as well."""
+        with self.guard_statements():
+            super().prefetch_thread_branches(objects, branches)
+
+    def guard_statements(self):
+        """Return a context manager applying `statement_timeout`."""
+        if self.statement_timeout is None:
+            return nullcontext()
+        using = self.model._default_manager.db
+        return statement_timeout(self.statement_timeout, using)
+
+    def http_guard_tripped(self, guard_tripped):
+        logger.warning("Guard %s tripped (%s): %s", guard_tripped.guard,
+                       type(self).__name__, self.request.path,
+                       extra={
+                           'status_code': guard_tripped.status_code,
+                           'request': self.request,
+                       })
+        guard_tripped_signal.send(sender=type(self), view=self,
+                                  guard=guard_tripped.guard)
+        return HttpResponse('Limit exceeded: {}'.format(guard_tripped.guard),
+                            status=guard_tripped.status_code,
+                            content_type='text/plain')
+
+
+class AsyncKhangoMixin(KhangoMixin):
+    """Asynchronous counterpart of `KhangoMixin` for ASGI deployments.
+    The planned queryset is evaluated with the async ORM when Django provides
+    it, and in the thread Django runs synchronous code in otherwise, so that
+    the event loop is never blocked on the database.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return markcoroutinefunction(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        if asyncio.iscoroutine(response):
+            response = await response
+        return response
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        context = await self.aget_context_data()
+        if not self.get_allow_empty() and \
+                await self.ais_empty(context['object_list']):
+            raise Http404(_("Empty list and '%(class_name)s.allow_empty' is "
+                            "False.") % {'class_name': type(self).__name__})
+        return await self.arender_to_response(context)
+
+    async def aget_context_data(self, **kwargs):
+        """Build the context and fetch the objects it lists."""
+        context = await sync_to_async(self.get_context_data)(**kwargs)
+        if not self.is_values_format():
+            await self.aevaluate(context['object_list'])
+        return context
+
+    async def ais_empty(self, object_list):
+        """Tell whether `object_list` is empty, querying out of the event
+        loop when it is not fetched, as for values formats.
+        """
+        if isinstance(object_list, QuerySet) and \
+                object_list._result_cache is None:
+            return not await sync_to_async(object_list.exists)()
+        return not object_list
+
+    async def aevaluate(self, object_list):
+        """Fill the result cache of `object_list` if it is a queryset."""
+        if not isinstance(object_list, QuerySet):
+            return object_list
+        if object_list._result_cache is not None:
+            return object_list
+        if hasattr(QuerySet, '__aiter__'):
+            async for obj in object_list:
+                pass
+        else:  # Django < 4.1
+            await sync_to_async(len)(object_list)
+        return object_list
+
+    async def arender_to_response(self, context, **response_kwargs):
+        """Render the response out of the event loop.
+        Streaming content is iterated the same way when Django supports
+        asynchronous streaming responses.
+        """
+        response = await sync_to_async(self.render_to_response)(
+            context, **response_kwargs)
+        if hasattr(response, 'render'):
+            await sync_to_async(response.render)()
+        is_async = getattr(response, 'is_async', None)
+        if response.streaming and is_async is False:
+            response.streaming_content = aiter_sync(
+                response.streaming_content)
+        return response
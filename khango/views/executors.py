@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+__all__ = [
+    'get_executor', 'call_in_thread',
+]
+
+DEFAULT_THREADS = {
+    'prefetch': 4,
+    'batch': 4,
+}
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name):
+    """Return the thread pool `name`, shared by all the requests of the
+    process.
+    Its size is the `KHANGO_<NAME>_THREADS` setting, read on first use, and
+    bounds the database connections its threads keep open.
+    """
+    with _executors_lock:
+        if name not in _executors:
+            max_workers = getattr(settings, 'KHANGO_{}_THREADS'.format(
+                name.upper()), DEFAULT_THREADS[name])
+            _executors[name] = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix='khango-{}'.format(name))
+        return _executors[name]
+
+
+def call_in_thread(func, *args):
+    """Call `func` from a pooled thread, closing its database connections
+    that are unusable or older than `CONN_MAX_AGE`, as a request would.
+    """
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import (
+    DEFAULT_DB_ALIAS, DatabaseError, OperationalError, connections,
+)
+
+__all__ = [
+    'GuardTripped', 'statement_timeout', 'get_request_slots',
+]
+
+logger = logging.getLogger('khango.guards')
+
+_request_slots = {}
+_request_slots_lock = threading.Lock()
+
+
+class GuardTripped(Exception):
+    """Raised when a request exceeds one of the resource guards of its view.
+    """
+
+    def __init__(self, guard, status_code):
+        super().__init__(guard, status_code)
+        self.guard = guard
+        self.status_code = status_code
+
+
+def get_request_slots(view_class, size):
+    """Return the semaphore bounding the concurrent requests of
+    `view_class` to `size`.
+    Views of the same class built with different sizes, as with
+    `as_view(max_concurrent_requests=...)`, get one semaphore per size.
+    """
+    key = (view_class, size)
+    with _request_slots_lock:
+        if key not in _request_slots:
+            _request_slots[key] = threading.BoundedSemaphore(size)
+        return _request_slots[key]
+
+
+@contextmanager
+def statement_timeout(seconds, using=DEFAULT_DB_ALIAS):
+    """Interrupt database queries of `using` that run longer than `seconds`
+    within the block, and raise `GuardTripped` instead.
+    """
+    connection = connections[using]
+    connection.ensure_connection()
+    if connection.vendor == 'sqlite':
+        context = _sqlite_statement_timeout(connection, seconds)
+    elif connection.vendor == 'postgresql':
+        context = _setting_statement_timeout(
+            connection, 'statement_timeout', int(seconds * 1000),
+            'SHOW statement_timeout')
+    elif connection.vendor == 'mysql':
+        context = _setting_statement_timeout(
+            connection, 'max_execution_time', int(seconds * 1000),
+            'SELECT @@SESSION.max_execution_time')
+    else:
+        logger.warning("Statement timeouts are not supported on %s.",
+                       connection.vendor)
+        context = _no_statement_timeout()
+    try:
+        with context:
+            yield
+    except OperationalError as e:
+        if is_timeout_error(e):
+            raise GuardTripped('statement_timeout', 503) from e
+        raise
+
+
+def is_timeout_error(error):
+    """Tell whether a database error comes from an interrupted query."""
+    cause = error.__cause__
+    if getattr(cause, 'pgcode', None) == '57014':  # query_canceled
+        return True
+    if cause is not None and cause.args and cause.args[0] in (3024, 1317):
+        return True  # MySQL
+    return str(error) == 'interrupted'  # SQLite
+
+
+@contextmanager
+def _sqlite_statement_timeout(connection, seconds):
+    # SQLite has no statement timeout: the progress handler aborts the
+    # current query once the deadline, reset by each new query, is passed.
+    deadline = [None]
+
+    def progress_handler():
+        return time.monotonic() > deadline[0]
+
+    def execute_wrapper(execute, sql, params, many, context):
+        deadline[0] = time.monotonic() + seconds
+        return execute(sql, params, many, context)
+
+    deadline[0] = time.monotonic() + seconds
+    connection.connection.set_progress_handler(progress_handler, 1000)
+    try:
+        with connection.execute_wrapper(execute_wrapper):
+            yield
+    finally:
+        connection.connection.set_progress_handler(None, 1000)
+
+
+@contextmanager
+def _setting_statement_timeout(connection, setting, milliseconds, show_sql):
+    # The previous value may come from the connection OPTIONS or an earlier
+    # SET, so it is restored rather than reset to the server default.
+    with connection.cursor() as cursor:
+        cursor.execute(show_sql)
+        previous = cursor.fetchone()[0]
+        cursor.execute('SET {} = %s'.format(setting), [milliseconds])
+    try:
+        yield
+    finally:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SET {} = %s'.format(setting), [previous])
+        except DatabaseError:
+            pass  # Rolling the aborted transaction back restores it.
+
+
+@contextmanager
+def _no_statement_timeout():
+    yield
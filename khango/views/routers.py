@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import re
+
+from django.urls import URLResolver, get_script_prefix
+from django.urls.resolvers import RegexPattern, ResolverMatch
+
+__all__ = [
+    'Router',
+]
+
+literal_pattern_re = re.compile(r'^\^((?:[^\\.^$*+?{}\[\]|()]|\\[/.-])*)\$$')
+
+
+class RouterResolver(URLResolver):
+    """Resolve paths of literal URL patterns with a single dict lookup, and
+    fall back on Django's linear resolution for the others.
+    """
+
+    def __init__(self, pattern, url_patterns, routes):
+        super().__init__(pattern, url_patterns)
+        self.routes = routes
+
+    def resolve(self, path):
+        path = str(path)
+        match = self.pattern.match(path)
+        if match:
+            new_path, args, kwargs = match
+            url_pattern = self.routes.get(new_path)
+            if url_pattern is not None:
+                sub_match = url_pattern.resolve(new_path)
+                return ResolverMatch(
+                    sub_match.func,
+                    sub_match.args,
+                    {**kwargs, **self.default_kwargs, **sub_match.kwargs},
+                    sub_match.url_name,
+                    [self.app_name],
+                    [self.namespace],
+                    sub_match.route,
+                )
+        return super().resolve(path)
+
+
+class Router:
+    """Register a set of khango views under a common path prefix.
+
+    Views are registered with their own `as_url()`, so `get_url_pattern()`
+    and `get_url_name()` keep working as usual, and `reverse()` as well.
+    Paths of views whose URL pattern is a plain literal, like the default
+    ones, are resolved with a dict lookup instead of trying each regex.
+    Literal patterns registered after a regex one are resolved in order,
+    like any other, so that the first matching pattern still wins.
+
+    The router is meant to be added to the root URLconf:
+        urlpatterns = [router.as_url()]
+    """
+
+    def __init__(self, prefix='', views=()):
+        self.prefix = prefix
+        self.url_patterns = []
+        self.routes = {}
+        self.paths = {}
+        self.ordered = False
+        for view_class in views:
+            self.register(view_class)
+
+    def register(self, view_class, **initkwargs):
+        """Add `view_class` to the router and return it."""
+        url_pattern = view_class.as_url(**initkwargs)
+        self.url_patterns.append(url_pattern)
+        match = literal_pattern_re.match(str(url_pattern.pattern))
+        if match:
+            path = match.group(1).replace('\\', '')
+            if not self.ordered:
+                self.routes.setdefault(path, url_pattern)
+            if url_pattern.name:
+                self.paths.setdefault(url_pattern.name, path)
+        else:
+            # A regex pattern may match the paths of later literal ones.
+            self.ordered = True
+        return view_class
+
+    def as_url(self):
+        return RouterResolver(RegexPattern('^{}'.format(re.escape(
+            self.prefix))), self.url_patterns, self.routes)
+
+    def reverse(self, name):
+        """Return the path of the literal URL pattern named `name`."""
+        return '{}{}{}'.format(get_script_prefix(), self.prefix,
+                               self.paths[name])
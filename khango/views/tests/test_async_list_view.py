@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.http import Http404
+from django.test import RequestFactory, TestCase
+
+from ..base import AsyncListView
+
+
+class UserView(AsyncListView):
+    model = User
+    fields = ['username']
+
+
+class AsyncListViewTestCase(TestCase):
+
+    def setUp(self):
+        User.objects.create(username='bob')
+        self.factory = RequestFactory()
+
+    def get(self, view, **kwargs):
+        return async_to_sync(view.as_view())(self.factory.get('/', **kwargs))
+
+    def test_is_async(self):
+        self.assertTrue(asyncio.iscoroutinefunction(UserView.as_view()))
+
+    def test_json(self):
+        response = self.get(UserView, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertDictEqual(json.loads(response.content.decode()), {
+            'object_list': [{'username': 'bob'}],
+        })
+
+    def test_html(self):
+        response = self.get(UserView, HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'<td>bob</td>', response.content)
+
+    def test_not_acceptable(self):
+        response = self.get(UserView, HTTP_ACCEPT='image/png')
+        self.assertEqual(response.status_code, 406)
+
+    def test_not_allow_empty(self):
+
+        class EmptyUserView(UserView):
+            allow_empty = False
+
+            def get_base_queryset(self):
+                return User.objects.none()
+
+        with self.assertRaises(Http404):
+            self.get(EmptyUserView, HTTP_ACCEPT='application/json')
+
+    def test_not_allow_empty_values_format(self):
+
+        class NotEmptyUserView(UserView):
+            allow_empty = False
+
+        accept = 'application/json; format=columns'
+        response = self.get(NotEmptyUserView, HTTP_ACCEPT=accept)
+        self.assertEqual(response.status_code, 200)
+        self.assertListEqual(json.loads(response.content.decode())['columns'],
+                             [['bob']])
+        User.objects.all().delete()
+        with self.assertRaises(Http404):
+            self.get(NotEmptyUserView, HTTP_ACCEPT=accept)
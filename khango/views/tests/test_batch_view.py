@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+
+from asgiref.sync import async_to_sync
+
+from django.conf.urls import url
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import AnonymousUser, User
+from django.test import (
+    AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase,
+    override_settings,
+)
+
+from examples.models import Question
+
+from ..base import AsyncListView, BatchView, ListView
+from ..executors import get_executor
+
+
+class QuestionView(ListView):
+    model = Question
+    fields = ['title', 'author__username']
+
+
+class UserView(ListView):
+    model = User
+    fields = ['username']
+
+
+class AsyncUserView(AsyncListView):
+    model = User
+    fields = ['username']
+
+
+class StreamingUserView(ListView):
+    model = User
+    fields = ['username']
+    stream_html = True
+    max_concurrent_requests = 1
+
+
+class DashboardView(BatchView):
+    views = [QuestionView, UserView, AsyncUserView, StreamingUserView]
+
+
+urlpatterns = [
+    QuestionView.as_url(),
+    url(UserView.get_url_pattern(), login_required(UserView.as_view()),
+        name=UserView.get_url_name()),
+]
+
+
+class BatchViewTestCase(TestCase):
+
+    def setUp(self):
+        author = User.objects.create(username='bob')
+        Question.objects.create(title='Why?', author=author)
+        self.factory = RequestFactory()
+
+    def post(self, data, view=DashboardView, **kwargs):
+        request = self.factory.post('/', json.dumps(data),
+                                    content_type='application/json',
+                                    **kwargs)
+        return view.as_view()(request)
+
+    def test_url_name(self):
+        self.assertEqual(QuestionView.get_url_name(), 'question_list')
+        self.assertEqual(DashboardView.get_url_name(), 'dashboard_batch')
+
+    def test_json(self):
+        response = self.post([
+            {'view': 'question_list'},
+            {'view': 'user_list', 'params': {'page': 1}},
+            {'view': 'unknown_list'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content.decode())
+        self.assertListEqual(data['responses'], [
+            {'view': 'question_list', 'status': 200, 'body': {
+                'object_list': [{'title': 'Why?', 'author__username': 'bob'}],
+            }},
+            {'view': 'user_list', 'status': 200, 'body': {
+                'object_list': [{'username': 'bob'}],
+            }},
+            {'view': 'unknown_list', 'status': 404,
+             'body': 'Unknown view "unknown_list".'},
+        ])
+
+    def test_async_view(self):
+        response = self.post([{'view': 'async_user_list'}])
+        data = json.loads(response.content.decode())
+        self.assertListEqual(data['responses'], [
+            {'view': 'async_user_list', 'status': 200, 'body': {
+                'object_list': [{'username': 'bob'}],
+            }},
+        ])
+
+    def test_ndjson(self):
+        response = self.post([{'view': 'user_list'}, {'view': 'user_list'}],
+                             HTTP_ACCEPT='application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0])['status'], 200)
+
+    def test_ndjson_asgi(self):
+        request = AsyncRequestFactory().post(
+            '/', json.dumps([{'view': 'user_list'}]),
+            content_type='application/json', accept='application/x-ndjson')
+        response = DashboardView.as_view()(request)
+
+        async def read():
+            # Django < 4.2 iterates streaming content within the event loop.
+            if getattr(response, 'is_async', False):
+                return [x async for x in response.streaming_content]
+            return list(response.streaming_content)
+
+        lines = b''.join(async_to_sync(read)()).decode().splitlines()
+        self.assertEqual(json.loads(lines[0])['status'], 200)
+
+    def test_sub_request_accept(self):
+        response = self.post([{
+            'view': 'user_list',
+            'accept': 'application/json; format=columns',
+        }])
+        data = json.loads(response.content.decode())
+        self.assertListEqual(data['responses'][0]['body']['columns'],
+                             [['bob']])
+
+    def test_streaming_slots_released(self):
+        for i in range(2):
+            response = self.post([{'view': 'streaming_user_list',
+                                   'accept': 'text/html'}] * 2)
+            data = json.loads(response.content.decode())
+            for result in data['responses']:
+                self.assertEqual(result['status'], 200)
+                self.assertIn('<td>bob</td>', result['body'])
+
+    def test_invalid(self):
+        self.assertEqual(self.post({'view': 'user_list'}).status_code, 400)
+        self.assertEqual(self.post([{'params': {}}]).status_code, 400)
+        self.assertEqual(self.post(['user_list']).status_code, 400)
+        self.assertEqual(self.post([{'view': ['x']}]).status_code, 400)
+        self.assertEqual(self.post([{'view': 'user_list',
+                                     'params': 'abc'}]).status_code, 400)
+        self.assertEqual(self.post([{'view': 'user_list',
+                                     'params': {'a': {'b': 1}}}]).status_code,
+                         400)
+        self.assertEqual(self.post([{'view': 'user_list',
+                                     'params': {'a': None}}]).status_code,
+                         400)
+        self.assertEqual(self.post([{'view': 'user_list',
+                                     'accept': 1}]).status_code, 400)
+        self.assertEqual(self.post([{'view': 'user_list',
+                                     'params': {'page': [1]}}]).status_code,
+                         200)
+        self.assertEqual(self.post([{'view': 'user_list'}] * 21).status_code,
+                         400)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class DecoratedBatchViewTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='bob')
+
+    def post(self, data, user):
+        request = RequestFactory().post('/', json.dumps(data),
+                                        content_type='application/json')
+        request.user = user
+        return DashboardView.as_view()(request)
+
+    def test_decorated_view(self):
+        data = json.loads(self.post([{'view': 'user_list'}],
+                                    AnonymousUser()).content.decode())
+        self.assertEqual(data['responses'][0]['status'], 302)
+        data = json.loads(self.post([{'view': 'user_list'}],
+                                    self.user).content.decode())
+        self.assertEqual(data['responses'][0]['status'], 200)
+
+    def test_wired_view(self):
+        data = json.loads(self.post([{'view': 'question_list'}],
+                                    AnonymousUser()).content.decode())
+        self.assertEqual(data['responses'][0]['status'], 200)
+
+
+class ConcurrentBatchViewTestCase(TransactionTestCase):
+
+    def test_concurrent(self):
+
+        class ConcurrentDashboardView(DashboardView):
+            max_workers = 4
+
+        User.objects.create(username='bob')
+        request = RequestFactory().post('/', json.dumps(
+            [{'view': 'user_list'}, {'view': 'async_user_list'}] * 4),
+            content_type='application/json')
+        response = ConcurrentDashboardView.as_view()(request)
+        data = json.loads(response.content.decode())
+        self.assertEqual(len(data['responses']), 8)
+        for result in data['responses']:
+            self.assertEqual(result['status'], 200)
+            self.assertListEqual(result['body']['object_list'],
+                                 [{'username': 'bob'}])
+
+    def test_shared_pool(self):
+        threads = set()
+
+        class ThreadUserView(UserView):
+
+            def get(self, request, *args, **kwargs):
+                threads.add(threading.current_thread().name)
+                return super().get(request, *args, **kwargs)
+
+        class ConcurrentDashboardView(BatchView):
+            views = [ThreadUserView, QuestionView]
+            max_workers = 3
+
+        request = RequestFactory().post('/', json.dumps(
+            [{'view': 'thread_user_list'}, {'view': 'question_list'}] * 4),
+            content_type='application/json')
+        for i in range(2):
+            response = ConcurrentDashboardView.as_view()(request)
+            data = json.loads(response.content.decode())
+            self.assertListEqual([x['view'] for x in data['responses']],
+                                 ['thread_user_list', 'question_list'] * 4)
+        self.assertIs(get_executor('batch'), get_executor('batch'))
+        self.assertLessEqual(len(threads), 4)
+        for name in threads:
+            self.assertTrue(name.startswith('khango-batch'))
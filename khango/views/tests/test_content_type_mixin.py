@@ -108,3 +108,21 @@ class GetAcceptedContentTypes(TestCase):
         self.assertListEqual(list(f.get_accepted_content_types()), [
             'text/html', 'application/xhtml+xml', 'application/xml', '*/*',
         ])
+
+
+class GetContentTypeParams(TestCase):
+
+    def test_not_provided(self):
+        f = ContentTypeMixin()
+        f.request = HttpRequest()
+        f.content_type = 'text/html'
+        self.assertDictEqual(f.get_content_type_params(), {})
+
+    def test_provided(self):
+        f = ContentTypeMixin()
+        f.request = HttpRequest()
+        f.request.META['HTTP_ACCEPT'] = \
+            'text/html;q=0.8, application/json; format=normalized; q=0.9'
+        f.content_type = 'application/json'
+        self.assertDictEqual(f.get_content_type_params(),
+                             {'format': 'normalized'})
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ...signals import guard_tripped
+from ..base import AsyncListView, ListView
+from ..guards import _setting_statement_timeout, get_request_slots
+
+SLOW_SQL = (
+    '(WITH RECURSIVE c(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM c '
+    'WHERE i < 100000000) SELECT COUNT(*) FROM c)'
+)
+
+
+class UserView(ListView):
+    model = User
+    fields = ['username']
+
+
+class GuardsTestCase(TestCase):
+
+    def setUp(self):
+        for username in ('alice', 'bob', 'carol'):
+            User.objects.create(username=username)
+        self.tripped = []
+        guard_tripped.connect(self.on_guard_tripped)
+        self.addCleanup(guard_tripped.disconnect, self.on_guard_tripped)
+
+    def on_guard_tripped(self, sender, view, guard, **kwargs):
+        self.tripped.append((sender, guard))
+
+    def get(self, view, accept='application/json'):
+        request = RequestFactory().get('/', HTTP_ACCEPT=accept)
+        return view.as_view()(request)
+
+    def test_statement_timeout(self):
+
+        class SlowUserView(UserView):
+            statement_timeout = 0.05
+
+            def get_base_queryset(self):
+                return User.objects.annotate(slow=RawSQL(SLOW_SQL, []))
+
+        response = self.get(SlowUserView)
+        self.assertEqual(response.status_code, 503)
+        self.assertListEqual(self.tripped,
+                             [(SlowUserView, 'statement_timeout')])
+
+    def test_statement_timeout_not_reached(self):
+
+        class FastUserView(UserView):
+            statement_timeout = 5
+
+        response = self.get(FastUserView)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content.decode())[
+            'object_list']), 3)
+
+    def test_max_rows(self):
+
+        class CappedUserView(UserView):
+            max_rows = 2
+
+        with self.assertNumQueries(1):
+            response = self.get(CappedUserView)
+        self.assertEqual(response.status_code, 413)
+        self.assertListEqual(self.tripped, [(CappedUserView, 'max_rows')])
+
+        CappedUserView.max_rows = 3
+        self.assertEqual(self.get(CappedUserView).status_code, 200)
+
+    def test_max_rows_paginated(self):
+
+        class CappedUserView(UserView):
+            max_rows = 2
+            paginate_by = 2
+
+        self.assertEqual(self.get(CappedUserView).status_code, 200)
+
+    def test_max_rows_streaming(self):
+
+        class CappedUserView(UserView):
+            max_rows = 2
+            stream_html = True
+
+        self.assertEqual(self.get(CappedUserView, 'text/html').status_code,
+                         413)
+
+    def test_max_concurrent_requests(self):
+
+        class BusyUserView(UserView):
+            max_concurrent_requests = 1
+
+        slots = get_request_slots(BusyUserView, 1)
+        slots.acquire()
+        try:
+            self.assertEqual(self.get(BusyUserView).status_code, 503)
+        finally:
+            slots.release()
+        self.assertEqual(self.get(BusyUserView).status_code, 200)
+        self.assertEqual(self.get(BusyUserView).status_code, 200)
+        self.assertListEqual(self.tripped,
+                             [(BusyUserView, 'max_concurrent_requests')])
+
+    def test_max_concurrent_requests_streaming(self):
+
+        class BusyUserView(UserView):
+            max_concurrent_requests = 1
+            stream_html = True
+
+        response = self.get(BusyUserView, 'text/html')
+        self.assertEqual(self.get(BusyUserView, 'text/html').status_code,
+                         503)
+        b''.join(response.streaming_content)
+        response.close()
+        self.assertEqual(self.get(BusyUserView, 'text/html').status_code,
+                         200)
+
+    def test_async(self):
+
+        class AsyncUserView(AsyncListView):
+            model = User
+            fields = ['username']
+            max_rows = 2
+            max_concurrent_requests = 1
+
+        request = RequestFactory().get('/', HTTP_ACCEPT='application/json')
+        response = async_to_sync(AsyncUserView.as_view())(request)
+        self.assertEqual(response.status_code, 413)
+        slots = get_request_slots(AsyncUserView, 1)
+        self.assertTrue(slots.acquire(blocking=False))
+        slots.release()
+
+    def test_request_slots_by_size(self):
+        slots = get_request_slots(UserView, 1)
+        self.assertIs(get_request_slots(UserView, 1), slots)
+        self.assertIsNot(get_request_slots(UserView, 2), slots)
+        self.assertTrue(slots.acquire(blocking=False))
+        try:
+            request = RequestFactory().get('/',
+                                           HTTP_ACCEPT='application/json')
+            response = UserView.as_view(max_concurrent_requests=2)(request)
+            self.assertEqual(response.status_code, 200)
+            response = UserView.as_view(max_concurrent_requests=1)(request)
+            self.assertEqual(response.status_code, 503)
+        finally:
+            slots.release()
+
+    def test_setting_restored(self):
+        connection = mock.MagicMock()
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = ('30s',)
+        with _setting_statement_timeout(connection, 'statement_timeout', 50,
+                                        'SHOW statement_timeout'):
+            pass
+        self.assertListEqual(cursor.execute.call_args_list, [
+            mock.call('SHOW statement_timeout'),
+            mock.call('SET statement_timeout = %s', [50]),
+            mock.call('SET statement_timeout = %s', ['30s']),
+        ])
+
+    def test_max_rows_before_prefetch(self):
+
+        class GuardedUserView(UserView):
+            fields = ['username', 'questions__title']
+            max_rows = 3
+            prefetch_limits = {'questions': (1, [])}
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(GuardedUserView)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 2)
+        self.assertIn('LIMIT 4', queries[0]['sql'])
+
+        GuardedUserView.max_rows = 2
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(GuardedUserView)
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('LIMIT 3', queries[0]['sql'])
+
+    def test_values_format(self):
+
+        class GuardedUserView(UserView):
+            statement_timeout = 5
+            max_rows = 3
+            prefetch_workers = 2
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(GuardedUserView,
+                                'application/json; format=columns')
+        self.assertEqual(response.status_code, 200)
+        self.assertListEqual(json.loads(response.content.decode())['columns'],
+                             [['alice', 'bob', 'carol']])
+        self.assertEqual(len(queries), 1)
+        self.assertIn('SELECT "auth_user"."username" FROM "auth_user"',
+                      queries[0]['sql'])
+        self.assertIn('LIMIT 4', queries[0]['sql'])
+
+        GuardedUserView.max_rows = 2
+        response = self.get(GuardedUserView, 'application/json; format=table')
+        self.assertEqual(response.status_code, 413)
@@ -1,8 +1,15 @@
 # -*- coding: utf-8 -*-
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist
 from django.db import models
+from django.http import HttpRequest, QueryDict
 from django.test import TestCase
 
-from ..behaviors import ModelMixin
+from examples.models import Question
+
+from ..behaviors import BadRequest, ModelMixin, get_field_value
 
 
 class Bar(models.Model):
@@ -40,6 +47,24 @@ class Baz(models.Model):
     barbouze.requires_fields = ['bar', 'foo']
 
 
+class Qux(models.Model):
+
+    class Meta:
+        app_label = 'test'
+
+    a = models.CharField(max_length=20)
+    foo = models.OneToOneField(Foo, models.CASCADE, related_name='qux')
+
+
+class Page(models.Model):
+
+    class Meta:
+        app_label = 'test'
+
+    order = models.IntegerField()
+    page = models.IntegerField()
+
+
 class ParseFieldsTestCase(TestCase):
 
     def test_simplest(self):
@@ -110,6 +135,22 @@ class ParseFieldsTestCase(TestCase):
         self.assertSetEqual(f.get_select_related(), set())
         self.assertSetEqual(f.get_prefetch_related(), {'foos'})
 
+    def test_reverse_relation_joins(self):
+
+        class BarView(ModelMixin):
+            model = Bar
+            fields = ['a', 'foos__a', 'foos__bar__b']
+
+        f = BarView()
+        self.assertSetEqual(f.get_select_related(), {'foos__bar'})
+        self.assertListEqual(f.get_prefetch_lookups(), ['foos', 'foos__bar'])
+        queryset = f.get_queryset()
+        self.assertEqual(queryset.query.deferred_loading,
+                         (frozenset({'a'}), False))
+        self.assertFalse(queryset.query.select_related)
+        self.assertEqual(queryset._prefetch_related_lookups,
+                         ('foos', 'foos__bar'))
+
     def test_many_to_many(self):
         pass
 
@@ -123,3 +164,283 @@ class ParseFieldsTestCase(TestCase):
         self.assertSetEqual(f.get_only(), {'bar', 'foo'})
         self.assertSetEqual(f.get_select_related(), {'bar', 'foo'})
         self.assertSetEqual(f.get_prefetch_related(), set())
+
+
+class JsonDataTestCase(TestCase):
+
+    def setUp(self):
+        self.bar = Bar(pk=1, a='bar', b=2, c=3)
+        self.foos = [
+            Foo(pk=1, a='x', b=1, c='c', bar=self.bar),
+            Foo(pk=2, a='y', b=2, c='c', bar=self.bar),
+        ]
+
+    def test_rows(self):
+
+        class FooView(ModelMixin):
+            model = Foo
+            fields = ['a', 'bar__a', 'bar__b']
+            content_type_params = {}
+
+        data = FooView().get_json_data({'object_list': self.foos})
+        self.assertListEqual(data['object_list'], [
+            {'a': 'x', 'bar__a': 'bar', 'bar__b': 2},
+            {'a': 'y', 'bar__a': 'bar', 'bar__b': 2},
+        ])
+
+    def test_normalized(self):
+
+        class FooView(ModelMixin):
+            model = Foo
+            fields = ['a', 'bar__a', 'bar__b']
+            content_type_params = {'format': 'normalized'}
+
+        data = FooView().get_json_data({'object_list': self.foos})
+        self.assertListEqual(data['object_list'], [
+            {'a': 'x', 'bar': 1},
+            {'a': 'y', 'bar': 1},
+        ])
+        self.assertDictEqual(data['related'], {
+            'test.bar': {'1': {'a': 'bar', 'b': 2}},
+        })
+        self.assertDictEqual(data['relations'], {'bar': 'test.bar'})
+
+    def test_normalized_foreignkey_only(self):
+
+        class FooView(ModelMixin):
+            model = Foo
+            fields = ['a', 'bar']
+            content_type_params = {'format': 'normalized'}
+
+        data = FooView().get_json_data({'object_list': self.foos})
+        self.assertListEqual(data['object_list'], [
+            {'a': 'x', 'bar': 1},
+            {'a': 'y', 'bar': 1},
+        ])
+        self.assertDictEqual(data['related'], {})
+
+    def test_missing_reverse_one_to_one(self):
+        foo = Foo(a='x', b=1, c='c', bar=self.bar)
+        self.assertIsNone(get_field_value(foo, 'qux'))
+        self.assertIsNone(get_field_value(foo, 'qux__a'))
+
+        class FooView(ModelMixin):
+            model = Foo
+            fields = ['a', 'qux__a']
+            content_type_params = {'format': 'normalized'}
+
+        # The reverse relation of a model out of the app registry is not a
+        # field, so the plan of a one-to-one reverse relation is mocked.
+        with mock.patch.object(FooView, 'get_select_related',
+                               return_value={'qux'}), \
+                mock.patch.object(FooView, 'get_relations',
+                                  return_value={'qux': 'test.qux'}):
+            data = FooView().get_json_data({'object_list': [foo]})
+        self.assertListEqual(data['object_list'], [{'a': 'x', 'qux': None}])
+
+    def test_relations_below_prefetch(self):
+
+        class QuestionView(ModelMixin):
+            model = Question
+            fields = ['author__username', 'answers__author__username']
+
+        self.assertDictEqual(QuestionView.get_relations(),
+                             {'author': 'auth.user'})
+
+    def test_normalized_chained(self):
+
+        class BazView(ModelMixin):
+            model = Baz
+            fields = ['foo__a', 'foo__bar__a', 'bar__a']
+            content_type_params = {'format': 'normalized'}
+
+        bazs = [
+            Baz(pk=1, bar=self.bar, foo=self.foos[0]),
+            Baz(pk=2, bar=self.bar, foo=self.foos[1]),
+        ]
+        data = BazView().get_json_data({'object_list': bazs})
+        self.assertListEqual(data['object_list'], [
+            {'foo': 1, 'bar': 1},
+            {'foo': 2, 'bar': 1},
+        ])
+        self.assertDictEqual(data['related'], {
+            'test.foo': {
+                '1': {'a': 'x', 'bar': 1},
+                '2': {'a': 'y', 'bar': 1},
+            },
+            'test.bar': {'1': {'a': 'bar'}},
+        })
+        self.assertDictEqual(data['relations'], {
+            'foo': 'test.foo', 'foo__bar': 'test.bar', 'bar': 'test.bar',
+        })
+
+
+class ColumnarDataTestCase(TestCase):
+
+    def setUp(self):
+        bar = Bar(pk=1, a='bar', b=2, c=3)
+        self.foos = [
+            Foo(pk=1, a='x', b=1, c='c', bar=bar),
+            Foo(pk=2, a='y', b=2, c='c', bar=bar),
+        ]
+
+    def test_columns(self):
+
+        class FooView(ModelMixin):
+            model = Foo
+            fields = ['a', 'bar__b']
+            content_type_params = {'format': 'columns'}
+
+        data = FooView().get_json_data({'object_list': self.foos})
+        self.assertListEqual(data['fields'], [
+            {'name': 'a', 'type': 'CharField'},
+            {'name': 'bar__b', 'type': 'IntegerField'},
+        ])
+        self.assertListEqual(data['columns'], [['x', 'y'], [2, 2]])
+
+    def test_table(self):
+
+        class BazView(ModelMixin):
+            model = Baz
+            fields = ['foo__a', 'barbouze']
+            content_type_params = {'format': 'table'}
+
+        bazs = [Baz(pk=1, bar=self.foos[0].bar, foo=self.foos[0])]
+        data = BazView().get_json_data({'object_list': bazs})
+        self.assertListEqual(data['fields'], [
+            {'name': 'foo__a', 'type': 'CharField'},
+            {'name': 'barbouze', 'type': None},
+        ])
+        self.assertListEqual(data['rows'], [['x', bazs[0].barbouze()]])
+
+    def test_values_fields(self):
+
+        class BarView(ModelMixin):
+            model = Bar
+            fields = ['a', 'foos__a']
+
+        class BazView(ModelMixin):
+            model = Baz
+            fields = ['foo__bar__a', 'foo', 'barbouze']
+
+        self.assertListEqual(BarView.get_values_fields(), ['a'])
+        self.assertListEqual(BazView.get_values_fields(),
+                             ['foo__bar__a', 'foo'])
+
+    def test_values_queryset(self):
+
+        class FooView(ModelMixin):
+            model = Foo
+            fields = ['a', 'bar__b']
+
+        class BazView(ModelMixin):
+            model = Baz
+            fields = ['foo__a', 'barbouze']
+
+        queryset = FooView().get_values_queryset(Foo.objects.all())
+        self.assertEqual(queryset.query.values_select, ('a', 'bar__b'))
+        self.assertIsNone(FooView().get_values_queryset(self.foos))
+        self.assertIsNone(BazView().get_values_queryset(Baz.objects.all()))
+
+
+class FilteringTestCase(TestCase):
+
+    def get_view(self, query_string, **attrs):
+        attrs.setdefault('model', Foo)
+        attrs.setdefault('fields', ['a', 'bar__a'])
+        view = type('FooView', (ModelMixin,), attrs)()
+        view.request = HttpRequest()
+        view.request.GET = QueryDict(query_string)
+        return view
+
+    def test_parse_lookup(self):
+        self.assertTupleEqual(ModelMixin._parse_lookup('bar__a', Foo),
+                              ('bar__a', Bar._meta.get_field('a'), ''))
+        self.assertTupleEqual(
+            ModelMixin._parse_lookup('bar__b__gte', Foo),
+            ('bar__b', Bar._meta.get_field('b'), 'gte'),
+        )
+        self.assertTupleEqual(ModelMixin._parse_lookup('bar__in', Foo),
+                              ('bar', Foo._meta.get_field('bar'), 'in'))
+        with self.assertRaises(FieldDoesNotExist):
+            ModelMixin._parse_lookup('page', Foo)
+
+    def test_filters(self):
+        view = self.get_view('bar__a=x&b__in=1,2&page=2&bar__isnull=false',
+                             filter_fields=['bar__a', 'b', 'bar'])
+        self.assertDictEqual(view.get_filters(), {
+            'bar__a': 'x', 'b__in': ['1', '2'], 'bar__isnull': False,
+        })
+
+    def test_range(self):
+        view = self.get_view('b__range=1,3', filter_fields=['b'])
+        self.assertDictEqual(view.get_filters(), {'b__range': ['1', '3']})
+        for value in ('1', '1,2,3'):
+            view = self.get_view('b__range=' + value, filter_fields=['b'])
+            with self.assertRaises(BadRequest):
+                view.get_filters()
+
+    def test_to_many_not_allowed(self):
+        view = self.get_view('questions__title=x', model=User,
+                             fields=['username'],
+                             filter_fields=['questions__title'])
+        with self.assertRaises(ValueError):
+            view.get_queryset()
+
+    def test_single_join(self):
+        view = self.get_view('bar__a=x&bar__b__gte=2&order=-bar__a',
+                             filter_fields=['bar__a', 'bar__b'],
+                             ordering_fields=['bar__a'])
+        sql = str(view.get_queryset().query)
+        self.assertEqual(sql.count('JOIN'), 1)
+        self.assertIn('ORDER BY "test_bar"."a" DESC', sql)
+
+    def test_filter_not_allowed(self):
+        view = self.get_view('c=x', filter_fields=['a'])
+        with self.assertRaises(BadRequest):
+            view.get_filters()
+
+    def test_unknown_lookup(self):
+        view = self.get_view('a__foo=x', filter_fields=['a'])
+        with self.assertRaises(BadRequest):
+            view.get_filters()
+        view = self.get_view('bar__a__year__gt=1', filter_fields=['bar__a'])
+        with self.assertRaises(BadRequest):
+            view.get_filters()
+
+    def test_invalid_value(self):
+        view = self.get_view('b=x', filter_fields=['b'])
+        with self.assertRaises(BadRequest):
+            view.get_queryset()
+
+    def test_ordering(self):
+        view = self.get_view('order=-a,bar__b',
+                             ordering_fields=['a', 'bar__b'])
+        self.assertListEqual(view.get_requested_ordering(), ['-a', 'bar__b'])
+        view = self.get_view('order=c', ordering_fields=['a'])
+        with self.assertRaises(BadRequest):
+            view.get_requested_ordering()
+
+    def test_reserved_params(self):
+        view = self.get_view('order=-order&page=2&order__gte=1', model=Page,
+                             fields=['order'], filter_fields=['order'],
+                             ordering_fields=['order'])
+        self.assertDictEqual(view.get_filters(), {'order__gte': '1'})
+        self.assertListEqual(view.get_requested_ordering(), ['-order'])
+
+    def test_ordering_requires_index(self):
+        view = self.get_view('order=-bar', ordering_fields=['a', 'bar'],
+                             ordering_requires_index=True)
+        self.assertListEqual(view.get_requested_ordering(), ['-bar'])
+        view = self.get_view('order=-a', ordering_fields=['a', 'bar'],
+                             ordering_requires_index=True)
+        with self.assertRaises(BadRequest):
+            view.get_requested_ordering()
+        view = self.get_view('order=-pk', ordering_fields=['pk'],
+                             ordering_requires_index=True)
+        self.assertListEqual(view.get_requested_ordering(), ['-pk'])
+        for path in ('d', 'bar__a__year'):
+            view = self.get_view('order=' + path, ordering_fields=[path],
+                                 ordering_requires_index=True)
+            with self.assertRaises(ValueError):
+                view.get_requested_ordering()
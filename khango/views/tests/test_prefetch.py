@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase
+
+from examples.models import Answer, Question
+
+from ..base import ListView
+from ..executors import get_executor
+from .test_guards import SLOW_SQL
+
+
+class UserView(ListView):
+    model = User
+    fields = ['username', 'questions__title', 'answers__content']
+
+
+class PrefetchTestMixin:
+
+    def get_data(self, view):
+        request = RequestFactory().get('/', HTTP_ACCEPT='application/json')
+        response = view.as_view()(request)
+        return json.loads(response.content.decode())
+
+
+class ConcurrentPrefetchTestCase(PrefetchTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        for username in ('alice', 'bob'):
+            author = User.objects.create(username=username)
+            question = Question.objects.create(title=username, author=author)
+            Answer.objects.create(question=question, author=author,
+                                  content=username)
+
+    def test_queryset(self):
+
+        class ConcurrentUserView(UserView):
+            prefetch_workers = 2
+
+        self.assertEqual(ConcurrentUserView().get_queryset()
+                         ._prefetch_related_lookups, ())
+
+    def test_same_result(self):
+
+        class ConcurrentUserView(UserView):
+            prefetch_workers = 2
+
+        # Prefetch queries run on the connections of other threads.
+        with self.assertNumQueries(1):
+            data = self.get_data(ConcurrentUserView)
+        self.assertDictEqual(data, self.get_data(UserView))
+        self.assertListEqual(data['object_list'], [
+            {'username': 'alice', 'questions__title': ['alice'],
+             'answers__content': ['alice']},
+            {'username': 'bob', 'questions__title': ['bob'],
+             'answers__content': ['bob']},
+        ])
+
+    def test_shared_pool(self):
+        threads = set()
+
+        class ConcurrentUserView(UserView):
+            prefetch_workers = 2
+
+            def prefetch_branch(self, objects, name, lookups):
+                threads.add(threading.current_thread().name)
+                super().prefetch_branch(objects, name, lookups)
+
+        for i in range(3):
+            self.get_data(ConcurrentUserView)
+        self.assertIs(get_executor('prefetch'), get_executor('prefetch'))
+        self.assertTrue(threads)
+        self.assertLessEqual(len(threads), 4)
+        for name in threads:
+            self.assertTrue(name.startswith('khango-prefetch'))
+
+    def test_statement_timeout(self):
+
+        class SlowUserView(UserView):
+            prefetch_workers = 2
+            statement_timeout = 0.05
+
+            def prefetch_branch(self, objects, name, lookups):
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT ' + SLOW_SQL)
+
+        request = RequestFactory().get('/', HTTP_ACCEPT='application/json')
+        response = SlowUserView.as_view()(request)
+        self.assertEqual(response.status_code, 503)
+
+
+class TransactionPrefetchTestCase(PrefetchTestMixin, TestCase):
+
+    def test_sequential_in_transaction(self):
+
+        class ConcurrentUserView(UserView):
+            prefetch_workers = 2
+
+        author = User.objects.create(username='bob')
+        question = Question.objects.create(title='uncommitted', author=author)
+        Answer.objects.create(question=question, author=author, content='a')
+        # Queries all run on the connection holding the transaction.
+        with self.assertNumQueries(3):
+            data = self.get_data(ConcurrentUserView)
+        self.assertListEqual(data['object_list'], [{
+                'username': 'bob', 'questions__title': ['uncommitted'],
+                'answers__content': ['a'],
+            }])
+
+
+class LimitedPrefetchTestCase(PrefetchTestMixin, TestCase):
+
+    def setUp(self):
+        author = User.objects.create(username='bob')
+        self.popular = Question.objects.create(title='popular')
+        for content in 'abcde':
+            Answer.objects.create(question=self.popular, author=author,
+                                  content=content)
+        self.quiet = Question.objects.create(title='quiet')
+        Answer.objects.create(question=self.quiet, content='z')
+
+    def test_limited(self):
+
+        class QuestionView(ListView):
+            model = Question
+            fields = ['title', 'answers__content']
+            prefetch_limits = {'answers': (3, ['-content'])}
+
+        with self.assertNumQueries(2):
+            data = self.get_data(QuestionView)
+        self.assertListEqual(data['object_list'], [
+            {'title': 'popular', 'answers__content': ['e', 'd', 'c']},
+            {'title': 'quiet', 'answers__content': ['z']},
+        ])
+        self.assertDictEqual(data['truncated'], {
+            str(self.popular.pk): {'answers': 5},
+        })
+
+    def test_limited_joins(self):
+
+        class QuestionView(ListView):
+            model = Question
+            fields = ['answers__author__username']
+            prefetch_limits = {'answers': (1, ['content'])}
+
+        with self.assertNumQueries(3):
+            data = self.get_data(QuestionView)
+        self.assertListEqual(data['object_list'], [
+            {'answers__author__username': ['bob']},
+            {'answers__author__username': [None]},
+        ])
+
+    def test_ordering_not_list(self):
+
+        class QuestionView(ListView):
+            model = Question
+            fields = ['title', 'answers__content']
+            prefetch_limits = {'answers': (3, '-content')}
+
+        with self.assertRaises(ValueError):
+            self.get_data(QuestionView)
+
+    def test_not_reverse_foreign_key(self):
+
+        class AnswerView(ListView):
+            model = Answer
+            fields = ['question__title']
+            prefetch_limits = {'question': (1, [])}
+
+        with self.assertRaises(ValueError):
+            self.get_data(AnswerView)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from django.urls import resolve, reverse
+
+from examples.models import Question
+
+from ..base import ListView
+from ..routers import Router
+
+
+class QuestionView(ListView):
+    model = Question
+    fields = ['title']
+
+
+class UserView(ListView):
+    model = User
+    fields = ['username']
+
+    @classmethod
+    def get_url_pattern(cls):
+        return r'^users/(?P<group>\w+)/$'
+
+
+router = Router('examples/', [QuestionView, UserView])
+
+urlpatterns = [router.as_url()]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class RouterTestCase(SimpleTestCase):
+
+    def test_routes(self):
+        self.assertListEqual(list(router.routes), ['question/list/'])
+
+    def test_resolve_literal(self):
+        match = resolve('/examples/question/list/')
+        self.assertEqual(match.url_name, 'question_list')
+        self.assertEqual(match.func.view_class, QuestionView)
+        self.assertEqual(match.route, '^examples/question/list/$')
+
+    def test_resolve_regex(self):
+        match = resolve('/examples/users/staff/')
+        self.assertEqual(match.url_name, 'user_list')
+        self.assertDictEqual(match.kwargs, {'group': 'staff'})
+
+    def test_reverse(self):
+        self.assertEqual(router.reverse('question_list'),
+                         '/examples/question/list/')
+        self.assertEqual(reverse('question_list'), '/examples/question/list/')
+        self.assertEqual(reverse('user_list', kwargs={'group': 'staff'}),
+                         '/examples/users/staff/')
+
+    def test_resolution_order(self):
+
+        class CatchView(ListView):
+            model = Question
+            fields = ['title']
+
+            @classmethod
+            def get_url_pattern(cls):
+                return r'^(?P<x>\w+)/list/$'
+
+        catch_router = Router('p/', [CatchView, QuestionView])
+        self.assertDictEqual(catch_router.routes, {})
+        match = catch_router.as_url().resolve('p/question/list/')
+        self.assertEqual(match.url_name, 'catch_list')
+        self.assertEqual(catch_router.reverse('question_list'),
+                         '/p/question/list/')
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import django
+from django.contrib.auth.models import User
+from django.test import (
+    AsyncRequestFactory, RequestFactory, TestCase, override_settings,
+)
+
+from examples.models import Answer, Question
+
+from ..base import ListView
+
+
+class UserView(ListView):
+    model = User
+    fields = ['username']
+    stream_html = True
+    stream_chunk_size = 2
+
+
+class StreamingHtmlTestCase(TestCase):
+
+    def setUp(self):
+        for username in ('alice', 'bob', 'carol'):
+            User.objects.create(username=username)
+
+    def get(self, view, accept='text/html'):
+        request = RequestFactory().get('/', HTTP_ACCEPT=accept)
+        return view.as_view()(request)
+
+    def test_streaming(self):
+        response = self.get(UserView)
+        self.assertTrue(response.streaming)
+        with self.assertNumQueries(1):
+            parts = [x.decode() for x in response.streaming_content]
+        self.assertEqual(len(parts), 4)
+        self.assertIn('<thead>', parts[0])
+        self.assertNotIn('<td>', parts[0])
+        self.assertIn('<td>alice</td>', parts[1])
+        self.assertIn('<td>bob</td>', parts[1])
+        self.assertNotIn('<thead>', parts[1])
+        self.assertIn('<td>carol</td>', parts[2])
+        self.assertIn('</table>', parts[3])
+        self.assertNotIn('</table>', parts[2])
+
+    def test_same_html(self):
+
+        class BufferedUserView(UserView):
+            stream_html = False
+
+        response = self.get(BufferedUserView)
+        response.render()
+        streamed = b''.join(self.get(UserView).streaming_content)
+        self.assertEqual(streamed.split(), response.content.split())
+
+    def test_asgi(self):
+        request = AsyncRequestFactory().get('/', accept='text/html')
+        response = UserView.as_view()(request)
+        if django.VERSION >= (4, 2):
+            self.assertTrue(response.is_async)
+        else:
+            # Streaming content would be iterated within the event loop.
+            self.assertFalse(response.streaming)
+            response.render()
+            self.assertIn(b'<td>carol</td>', response.content)
+
+    def test_json_not_streamed(self):
+        self.assertFalse(self.get(UserView, 'application/json').streaming)
+
+    def test_prefetch_by_chunk(self):
+
+        class QuestionView(ListView):
+            model = Question
+            fields = ['title', 'answers']
+            stream_html = True
+            stream_chunk_size = 2
+
+        for title in 'abc':
+            question = Question.objects.create(title=title)
+            Answer.objects.create(question=question)
+        response = self.get(QuestionView)
+        # Rows are read from a single cursor, and prefetched by chunk.
+        with self.assertNumQueries(3):
+            b''.join(response.streaming_content)
+
+    @override_settings(TEMPLATES=[{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'OPTIONS': {
+            'loaders': [('django.template.loaders.locmem.Loader', {
+                'auth/user/list.html': (
+                    '{% if stream_part == "head" %}<ul>{% endif %}'
+                    '{% for object in object_list %}'
+                    '<li>{{ object.username }}</li>'
+                    '{% endfor %}'
+                    '{% if stream_part == "foot" %}</ul>{% endif %}'
+                ),
+            })],
+        },
+    }])
+    def test_template_override(self):
+        content = b''.join(self.get(UserView).streaming_content).decode()
+        self.assertEqual(content, (
+            '<ul><li>alice</li><li>bob</li><li>carol</li></ul>'
+        ))